@@ -0,0 +1,135 @@
+"""
+Redis Cache Configuration (optional cache-aside layer)
+"""
+import os
+from typing import Optional
+
+# The cache is strictly optional: every helper degrades to a no-op when the
+# redis package isn't installed or the server is unreachable, so the app
+# works unchanged without it.
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+client = None
+
+async def connect_to_redis():
+    """Connect to Redis; the cache layer is disabled if this fails"""
+    global client
+    if aioredis is None:
+        print("ℹ️  redis package not installed; cache layer disabled")
+        return
+    try:
+        client = aioredis.from_url(REDIS_URL, decode_responses=True)
+        await client.ping()
+        print("✅ Connected to Redis")
+    except Exception as e:
+        client = None
+        print(f"ℹ️  Redis unavailable; cache layer disabled ({e})")
+
+async def close_redis_connection():
+    """Close Redis connection"""
+    global client
+    if client:
+        await client.aclose()
+        client = None
+
+async def cache_get(key: str) -> Optional[str]:
+    """Fetch a cached value, or None on miss / disabled cache"""
+    if client is None:
+        return None
+    try:
+        return await client.get(key)
+    except Exception:
+        return None
+
+async def cache_set(key: str, value: str, ttl: int):
+    """Store a value with a TTL; silently a no-op when the cache is disabled"""
+    if client is None:
+        return
+    try:
+        await client.setex(key, ttl, value)
+    except Exception:
+        pass
+
+async def cache_version(name: str) -> str:
+    """Read a namespace version counter (used to build cache keys)"""
+    if client is None:
+        return "0"
+    try:
+        return await client.get(name) or "0"
+    except Exception:
+        return "0"
+
+# Materialized "following" feeds: one sorted set of recent post ids per user,
+# scored by post timestamp and written at post-creation time (fanout-on-write)
+FEED_KEY_PREFIX = "v1:feed:following:"
+FEED_MAX_ENTRIES = 1000
+
+async def fanout_post(usernames, post_id: str, timestamp):
+    """Push a new post id onto each recipient's materialized feed, trimming
+    the sets so they stay bounded"""
+    if client is None or not usernames:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        score = timestamp.timestamp()
+        for name in usernames:
+            key = f"{FEED_KEY_PREFIX}{name}"
+            pipe.zadd(key, {post_id: score})
+            pipe.zremrangebyrank(key, 0, -(FEED_MAX_ENTRIES + 1))
+        await pipe.execute()
+    except Exception:
+        pass
+
+async def materialized_feed_ids(username: str, limit: int = 100):
+    """Most recent post ids from the user's materialized feed, newest first.
+    Returns None when the cache is disabled or the set is empty so the
+    caller can fall back to the pull query"""
+    if client is None:
+        return None
+    try:
+        ids = await client.zrevrange(f"{FEED_KEY_PREFIX}{username}", 0, limit - 1)
+        return ids or None
+    except Exception:
+        return None
+
+async def clear_feed(username: str):
+    """Drop a user's materialized feed so the next load rebuilds it from the
+    pull query — called when their follow graph changes, since fanned-out
+    entries can't be selectively rewritten for follows/unfollows"""
+    if client is None:
+        return
+    try:
+        await client.delete(f"{FEED_KEY_PREFIX}{username}")
+    except Exception:
+        pass
+
+async def backfill_feed(username: str, id_scores):
+    """Seed a user's materialized feed from pull-query results so sets that
+    started empty (pre-deploy history) reach a full page without waiting for
+    new posts to fan out. id_scores is an iterable of (post_id, score)"""
+    if client is None:
+        return
+    mapping = dict(id_scores)
+    if not mapping:
+        return
+    try:
+        key = f"{FEED_KEY_PREFIX}{username}"
+        await client.zadd(key, mapping)
+        await client.zremrangebyrank(key, 0, -(FEED_MAX_ENTRIES + 1))
+    except Exception:
+        pass
+
+async def bump_version(name: str):
+    """Increment a namespace version counter, invalidating every key built
+    from the old version in O(1); stale keys simply expire via their TTL"""
+    if client is None:
+        return
+    try:
+        await client.incr(name)
+    except Exception:
+        pass
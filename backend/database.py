@@ -1,35 +1,103 @@
 """
 MongoDB Database Configuration
 """
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import AsyncMongoClient
 from typing import Optional
+import os
 
-MONGO_URL = "mongodb://localhost:27017"
-DATABASE_NAME = "peopleconnects"
+# Read once at import; defaults match local development
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+DATABASE_NAME = os.getenv("DATABASE_NAME", "peopleconnects")
 
-client: Optional[AsyncIOMotorClient] = None
+client: Optional[AsyncMongoClient] = None
+db = None  # cached Database handle, assigned in connect_to_mongo
 
 async def connect_to_mongo():
     """Connect to MongoDB and create indexes for optimization"""
-    global client
-    client = AsyncIOMotorClient(MONGO_URL)
+    global client, db
+    client = AsyncMongoClient(
+        MONGO_URL,
+        maxPoolSize=50,           # enough for concurrent handlers without oversubscribing
+        minPoolSize=10,           # keep warm connections so first requests skip handshakes
+        serverSelectionTimeoutMS=3000,
+        socketTimeoutMS=20000,
+        maxIdleTimeMS=60000,      # recycle idle connections instead of churning the pool
+        retryWrites=True,
+        # Wire compression for app<->DB traffic; the driver negotiates what
+        # both sides support and silently skips codecs whose Python package
+        # is missing (zlib is always available)
+        compressors="zstd,snappy,zlib",
+        zlibCompressionLevel=-1,
+    )
     db = client[DATABASE_NAME]
-    
+
+    # Force a connection now so the first real request doesn't pay the
+    # TCP/auth handshake; minPoolSize keeps the rest warming in background
+    await client.admin.command("ping")
+
+
     # Create indexes for better performance
     await db.users.create_index("username", unique=True)
     await db.users.create_index("email", unique=True)
+    # Covering indexes so login/auth lookups are answered from the index
+    # alone (IXSCAN with no document fetch) when paired with a projection
+    await db.users.create_index([("username", 1), ("password", 1), ("_id", 1)])
+    await db.users.create_index([("email", 1), ("_id", 1)])
+    # Lowercased shadow fields so user search stays case-insensitive while
+    # still bounding the scan with an index (a case-insensitive regex can't)
+    await db.users.create_index("username_lower")
+    await db.users.create_index("email_lower")
     await db.posts.create_index([("timestamp", -1)])  # For sorting by newest
-    await db.posts.create_index("author")  # For filtering by author
+    # Serves find({author}).sort({timestamp:-1}) with one bounded index scan
+    # (no in-memory sort); also covers plain author filters, so no separate
+    # single-field author index is needed
+    await db.posts.create_index([("author", 1), ("timestamp", -1)])
+    # Text index so post search uses $text scoring instead of an unanchored
+    # case-insensitive regex (which can never use a B-tree index)
+    await db.posts.create_index([("content", "text")])
+    # Powers the "popular" feed sort on the stored like counter
+    await db.posts.create_index([("like_count", -1), ("timestamp", -1)])
+
+    # One-time backfill of the lowercased search fields for existing users
+    await db.users.update_many(
+        {"username_lower": {"$exists": False}},
+        [{"$set": {
+            "username_lower": {"$toLower": "$username"},
+            "email_lower": {"$toLower": {"$ifNull": ["$email", ""]}}
+        }}]
+    )
+
+    # One-time backfill for posts created before the denormalized counters:
+    # sorting on like_count treats a missing field as null (below every
+    # number), so without this, old posts would rank under brand-new ones
+    # no matter how many likes their arrays hold
+    await db.posts.update_many(
+        {"like_count": {"$exists": False}},
+        [{"$set": {
+            "like_count": {"$size": "$likes"},
+            "comment_count": {"$size": "$comments"}
+        }}]
+    )
     
     print("✅ Connected to MongoDB and indexes created")
 
 async def close_mongo_connection():
     """Close MongoDB connection"""
-    global client
+    global client, db
     if client:
-        client.close()
+        await client.close()
+        db = None
         print("❌ MongoDB connection closed")
 
 def get_database():
-    """Get database instance"""
-    return client[DATABASE_NAME]
+    """Get the cached database instance"""
+    return db
+
+async def aggregate_to_list(collection, pipeline: list, length: int) -> list:
+    """Run an aggregation and materialize up to `length` results.
+
+    PyMongo's native async driver makes aggregate() itself a coroutine
+    (unlike Motor), so this wraps the two awaits for call sites.
+    """
+    cursor = await collection.aggregate(pipeline)
+    return await cursor.to_list(length)
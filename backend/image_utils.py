@@ -2,29 +2,153 @@
 Image Processing Utilities
 """
 from PIL import Image
+import asyncio
 import io
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-def optimize_image(image_path: Path, max_width: int = 1200, max_height: int = 1200, quality: int = 85):
+# Optional: libjpeg-turbo via PyTurboJPEG for SIMD-accelerated JPEG decode/encode
+# (several times faster than Pillow's baseline libjpeg). Falls back to Pillow
+# when the library isn't installed.
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB
+    import numpy as _np
+    _turbo = TurboJPEG()
+except Exception:
+    _turbo = None
+
+# Optional: simplejpeg is a thin wrapper over libjpeg-turbo's encoder and
+# shaves a few ms per encode vs Pillow; used when PyTurboJPEG isn't available
+try:
+    import simplejpeg as _simplejpeg
+    import numpy as _np
+except Exception:
+    _simplejpeg = None
+
+# Optional: OpenCV's SIMD-optimized resize beats PIL's LANCZOS for large
+# downscales (INTER_AREA is the recommended interpolation for shrinking)
+try:
+    import cv2 as _cv2
+    import numpy as _np
+except Exception:
+    _cv2 = None
+
+JPEG_SUFFIXES = {'.jpg', '.jpeg'}
+
+# Hoisted so the enum attribute isn't resolved on every call
+LANCZOS = Image.Resampling.LANCZOS
+
+# Cap decode size so a decompression bomb can't exhaust memory
+# (~64 MP, far above any legitimate photo upload)
+Image.MAX_IMAGE_PIXELS = 64_000_000
+
+# Process pool so CPU-bound PIL work runs in parallel across cores instead of
+# blocking the asyncio event loop (or starving FastAPI's thread pool)
+_executor = ProcessPoolExecutor(max_workers=os.cpu_count())
+
+def _is_jpeg(image_path: Path) -> bool:
+    """Check if a path points to a JPEG file by extension"""
+    return Path(image_path).suffix.lower() in JPEG_SUFFIXES
+
+def _open_image(image_path: Path) -> Image.Image:
+    """Open an image, using libjpeg-turbo for JPEG decode when available"""
+    if _turbo is not None and _is_jpeg(image_path):
+        with open(image_path, 'rb') as f:
+            return Image.fromarray(_turbo.decode(f.read(), pixel_format=TJPF_RGB))
+    return Image.open(image_path)
+
+def _save_image(img: Image.Image, image_path: Path, quality: int = 85):
+    """Save an image, using libjpeg-turbo for JPEG encode when available"""
+    if _turbo is not None and _is_jpeg(image_path) and img.mode == 'RGB':
+        jpeg_bytes = _turbo.encode(_np.asarray(img), quality=quality, pixel_format=TJPF_RGB)
+        Path(image_path).write_bytes(jpeg_bytes)
+    elif _simplejpeg is not None and _is_jpeg(image_path) and img.mode == 'RGB':
+        jpeg_bytes = _simplejpeg.encode_jpeg(
+            _np.ascontiguousarray(_np.asarray(img)),
+            quality=quality, colorspace='RGB', fastdct=True)
+        Path(image_path).write_bytes(jpeg_bytes)
+    elif _is_jpeg(image_path):
+        # Progressive + optimized Huffman tables: a few percent smaller and
+        # renders incrementally in browsers; 4:2:0 subsampling is standard
+        # for photos
+        img.save(image_path, 'JPEG', quality=quality, optimize=True,
+                 progressive=True, subsampling=2)
+    else:
+        img.save(image_path, quality=quality, optimize=True)
+
+def _save_webp(img: Image.Image, image_path: Path, quality: int = 85):
+    """Save a WebP variant next to the original (25-35% smaller at equal quality)"""
+    try:
+        img.save(Path(image_path).with_suffix('.webp'), 'WEBP', quality=quality, method=6)
+    except Exception as e:
+        print(f"Error saving WebP variant: {e}")
+
+def _to_rgb(img: Image.Image) -> Image.Image:
+    """Normalize to an encodable mode, compositing alpha onto white"""
+    if img.mode in ('RGB', 'L'):
+        return img
+    if img.mode == 'RGBA':
+        background = Image.new('RGB', img.size, 'white')
+        background.paste(img, mask=img.split()[3])
+        return background
+    return img.convert('RGB')
+
+def _already_optimized(probe: Image.Image, byte_size: int, max_width: int, max_height: int) -> bool:
+    """Cheap header check: an already-small, reasonably compressed JPEG gains
+    nothing from a decode/re-encode round-trip and usually comes out larger"""
+    return (probe.format == 'JPEG'
+            and probe.width <= max_width and probe.height <= max_height
+            and byte_size < 300_000)
+
+def _resize_and_save(img: Image.Image, out_path: Path, max_width: int, max_height: int, quality: int):
+    """Normalize mode, downscale if needed, and write JPEG + WebP variants"""
+    img = _to_rgb(img)
+
+    # Resize if image is too large
+    if img.width > max_width or img.height > max_height:
+        if _cv2 is not None and img.mode == 'RGB':
+            scale = min(max_width / img.width, max_height / img.height)
+            new_size = (max(1, round(img.width * scale)),
+                        max(1, round(img.height * scale)))
+            resized = _cv2.resize(_np.asarray(img), new_size,
+                                  interpolation=_cv2.INTER_AREA)
+            img = Image.fromarray(resized)
+        else:
+            # Fast integer box-downscale in C first when the source is far
+            # larger than the target; LANCZOS then only filters a small buffer
+            factor = min(img.width // max_width, img.height // max_height)
+            if factor >= 2:
+                img = img.reduce(factor)
+            img.thumbnail((max_width, max_height), LANCZOS)
+
+    # Save optimized image
+    _save_image(img, out_path, quality=quality)
+    # WebP variant alongside, for CDN/proxy content negotiation
+    _save_webp(img, out_path, quality=quality)
+
+def optimize_upload(data: bytes, out_path: Path, max_width: int = 1200,
+                    max_height: int = 1200, quality: int = 85):
     """
-    Optimize uploaded image: resize if too large and reduce quality
+    Optimize an in-memory upload and write only the final file(s) to disk:
+    resize if too large, reduce quality, skip already-optimized JPEGs
     """
     try:
-        with Image.open(image_path) as img:
-            # Convert RGBA to RGB if necessary
-            if img.mode == 'RGBA':
-                img = img.convert('RGB')
-            
-            # Resize if image is too large
-            if img.width > max_width or img.height > max_height:
-                img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
-            
-            # Save optimized image
-            img.save(image_path, quality=quality, optimize=True)
-            
+        with Image.open(io.BytesIO(data)) as probe:
+            if _already_optimized(probe, len(data), max_width, max_height):
+                Path(out_path).write_bytes(data)
+                return True
+
+        if _turbo is not None and _is_jpeg(out_path):
+            img = Image.fromarray(_turbo.decode(data, pixel_format=TJPF_RGB))
+        else:
+            img = Image.open(io.BytesIO(data))
+        with img:
+            _resize_and_save(img, out_path, max_width, max_height, quality)
+
         return True
     except Exception as e:
-        print(f"Error optimizing image: {e}")
+        print(f"Error optimizing upload: {e}")
         return False
 
 def create_thumbnail(image_path: Path, size: tuple = (300, 300)) -> Path:
@@ -32,19 +156,35 @@ def create_thumbnail(image_path: Path, size: tuple = (300, 300)) -> Path:
     Create a thumbnail version of an image
     """
     try:
-        with Image.open(image_path) as img:
-            # Convert RGBA to RGB if necessary
-            if img.mode == 'RGBA':
-                img = img.convert('RGB')
-            
+        with _open_image(image_path) as img:
+            # For JPEGs, ask libjpeg for a scaled IDCT decode (1/2, 1/4, 1/8)
+            # close to 2x the target so the decoder skips most of the work;
+            # LANCZOS below then only filters a small buffer
+            if img.format == 'JPEG':
+                img.draft('RGB', (size[0] * 2, size[1] * 2))
+
+            img = _to_rgb(img)
+
             # Create thumbnail
-            img.thumbnail(size, Image.Resampling.LANCZOS)
-            
+            img.thumbnail(size, LANCZOS)
+
             # Generate thumbnail filename
             thumb_path = image_path.parent / f"thumb_{image_path.name}"
-            img.save(thumb_path, quality=85, optimize=True)
-            
+            _save_image(img, thumb_path, quality=85)
+            _save_webp(img, thumb_path, quality=85)
+
             return thumb_path
     except Exception as e:
         print(f"Error creating thumbnail: {e}")
         return None
+
+async def optimize_upload_async(data: bytes, out_path: Path, max_width: int = 1200,
+                                max_height: int = 1200, quality: int = 85):
+    """Run optimize_upload in the process pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, optimize_upload, data, out_path, max_width, max_height, quality)
+
+async def create_thumbnail_async(image_path: Path, size: tuple = (300, 300)):
+    """Run create_thumbnail in the process pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, create_thumbnail, image_path, size)
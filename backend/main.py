@@ -1,14 +1,23 @@
 """
 FastAPI Main Application - PeopleConnects
 """
-from fastapi import FastAPI, Request, HTTPException, Depends, Form, status, UploadFile, File
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import FastAPI, Request, HTTPException, Depends, Form, status, UploadFile, File, BackgroundTasks
+from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from datetime import datetime
 from typing import Optional
 from bson import ObjectId
-import shutil
+from pymongo import UpdateMany
+from cachetools import TTLCache
+import aiofiles
+import asyncio
+from jinja2 import FileSystemBytecodeCache
+import hashlib
+import hmac
+import re
+import tempfile
+import time
 import uuid
 import sys
 from pathlib import Path
@@ -18,17 +27,44 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 if str(BASE_DIR) not in sys.path:
     sys.path.insert(0, str(BASE_DIR))
 
-from backend.database import connect_to_mongo, close_mongo_connection, get_database
+from backend.database import connect_to_mongo, close_mongo_connection, get_database, aggregate_to_list
+from backend.cache import (
+    connect_to_redis, close_redis_connection,
+    cache_get, cache_set, cache_version, bump_version,
+    fanout_post, materialized_feed_ids, backfill_feed, clear_feed
+)
 from backend.models import UserCreate, UserLogin, PostCreate, CommentCreate, AdminLogin
-from backend.auth import hash_password, verify_password, create_access_token
-from backend.image_utils import optimize_image
+from backend.auth import hash_password, verify_password, create_access_token, decode_token
+from backend.image_utils import optimize_upload_async, create_thumbnail_async
 
 app = FastAPI(title="PeopleConnects")
 
 # Static files and templates
 
-app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="static")
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles that marks uploaded images as immutable for browser/CDN caching.
+
+    Upload filenames are UUIDs so their content never changes; far-future
+    Cache-Control lets repeat views terminate at the browser or CDN edge.
+    """
+    async def get_response(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        if path.startswith("uploads/") and response.status_code in (200, 304):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+app.mount("/static", CachedStaticFiles(directory=str(BASE_DIR / "static")), name="static")
+# Compile templates once: no per-request mtime checks (auto_reload=False),
+# every compiled template stays resident (cache_size=-1), and the bytecode
+# cache persists compilation across restarts
+_jinja_cache_dir = Path(tempfile.gettempdir()) / "peopleconnects_jinja_cache"
+_jinja_cache_dir.mkdir(exist_ok=True)
+templates = Jinja2Templates(
+    directory=str(BASE_DIR / "templates"),
+    auto_reload=False,
+    cache_size=-1,
+    bytecode_cache=FileSystemBytecodeCache(str(_jinja_cache_dir)),
+)
 
 # Admin credentials (in production, store these securely)
 ADMIN_USERNAME = "admin"
@@ -37,47 +73,174 @@ ADMIN_PASSWORD_HASH = hash_password("admin123")
 @app.on_event("startup")
 async def startup_db_client():
     await connect_to_mongo()
+    await connect_to_redis()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     await close_mongo_connection()
+    await close_redis_connection()
+
+# Cache version counters: bumping one invalidates every key derived from it
+FEED_CACHE_VER = "v1:feed:ver"
+
+def profile_cache_ver(username: str) -> str:
+    return f"v1:profile:ver:{username}"
+
+# L1 cache for username -> profile_pic: avatars change rarely, so hot authors
+# are served from process memory without any database round-trip
+PFP_CACHE = TTLCache(maxsize=10_000, ttl=60)
+
+async def get_pfps(db, usernames) -> dict:
+    """Resolve username -> profile_pic through the L1 cache, batch-fetching
+    only the misses with a single $in query"""
+    pfps = {}
+    misses = []
+    for name in set(usernames):
+        if name in PFP_CACHE:
+            pfps[name] = PFP_CACHE[name]
+        else:
+            misses.append(name)
+    if misses:
+        docs = await db.users.find(
+            {"username": {"$in": misses}},
+            {"username": 1, "profile_pic": 1}
+        ).to_list(len(misses))
+        for doc in docs:
+            pfps[doc["username"]] = PFP_CACHE[doc["username"]] = doc.get("profile_pic")
+    return pfps
+
+# Short-lived token cache: skips the JWT parse + HMAC verify on every request
+# after the first sight of a token. Entries carry the token's own exp claim,
+# re-checked on every hit, so a cached token is never honored past the expiry
+# decode_token would enforce. Invalid tokens cache None so garbage can't
+# force repeated verification either
+TOKEN_CACHE = TTLCache(maxsize=50_000, ttl=300)
+_TOKEN_MISS = object()
 
-# Helper function to get current user from cookie
-def get_current_user(request: Request) -> Optional[str]:
+# Current-user dependency: routes declare it with Depends so FastAPI
+# resolves (and memoizes) it once per request. async so it runs on the event
+# loop, not the threadpool: cachetools caches aren't thread-safe, and every
+# mutation of TOKEN_CACHE (here, logout, edit_profile) must stay
+# single-threaded — which also skips a threadpool dispatch per request
+async def get_current_user(request: Request) -> Optional[str]:
     token = request.cookies.get("access_token")
     if not token:
         return None
-    from backend.auth import decode_token
+    cached = TOKEN_CACHE.get(token, _TOKEN_MISS)
+    if cached is not _TOKEN_MISS:
+        if cached is None:
+            return None
+        username, exp = cached
+        if exp is None or exp > time.time():
+            return username
+        TOKEN_CACHE.pop(token, None)  # token expired while cached
+        return None
     payload = decode_token(token)
     if payload:
+        TOKEN_CACHE[token] = (payload.get("sub"), payload.get("exp"))
         return payload.get("sub")
+    TOKEN_CACHE[token] = None
     return None
 
+# Upload validation: reject junk in O(few bytes) before any disk or PIL work
+ALLOWED_IMAGE_TYPES = {"image/jpeg", "image/jpg", "image/png", "image/gif", "image/webp"}
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+
+def _looks_like_image(header: bytes) -> bool:
+    """Magic-byte sniff for the image formats we accept"""
+    return (header.startswith(b"\xff\xd8\xff")                       # JPEG
+            or header.startswith(b"\x89PNG\r\n\x1a\n")               # PNG
+            or header.startswith((b"GIF87a", b"GIF89a"))             # GIF
+            or (header[:4] == b"RIFF" and header[8:12] == b"WEBP"))  # WebP
+
 # Helper function to save uploaded file
-async def save_upload_file(upload_file: UploadFile, upload_dir: str) -> str:
-    """Save uploaded file and return filename"""
+async def save_upload_file(upload_file: UploadFile, upload_dir: str,
+                           background_tasks: BackgroundTasks = None) -> str:
+    """Validate and save uploaded file, returning its URL path"""
     if not upload_file:
         return None
-    
-    # Generate unique filename
-    file_extension = upload_file.filename.split(".")[-1].lower()
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
+
+    if upload_file.content_type not in ALLOWED_IMAGE_TYPES:
+        raise HTTPException(status_code=415, detail="Invalid file type. Only images allowed.")
+    if upload_file.size and upload_file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Image too large (max 10 MB).")
+    
+    # Generate unique filename. Path.suffix takes only the final extension
+    # (split('.') would pick 'exe' out of 'a.jpg.exe'), checked against the
+    # allowlist; the dashless hex UUID keeps URLs shorter in rendered pages
+    file_extension = Path(upload_file.filename).suffix.lower().lstrip(".")
+    if file_extension not in {"jpg", "jpeg", "png", "gif", "webp"}:
+        raise HTTPException(status_code=415, detail="Invalid file extension. Only images allowed.")
+    unique_filename = f"{uuid.uuid4().hex}.{file_extension}"
     file_path = BASE_DIR / "static" / "uploads" / upload_dir / unique_filename
-    
-    # Save file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(upload_file.file, buffer)
-    
-    # Optimize image (reduce size and quality)
-    optimize_image(file_path, max_width=1200, max_height=1200, quality=85)
-    
+
+    # Stream the upload in 1 MiB chunks — each read yields the event loop,
+    # so a slow or large upload never stalls other requests. The first chunk
+    # is sniffed so a mislabeled non-image fails before anything is written,
+    # and the size cap is enforced even when the client omits Content-Length
+    chunks = []
+    total = 0
+    while chunk := await upload_file.read(1 << 20):
+        if not chunks and not _looks_like_image(chunk):
+            raise HTTPException(status_code=415, detail="File content is not a supported image.")
+        total += len(chunk)
+        if total > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="Image too large (max 10 MB).")
+        chunks.append(chunk)
+    data = b"".join(chunks)
+
+    if background_tasks is not None:
+        # Two-stage ingest: persist the raw bytes now so the post renders
+        # immediately, and recompress after the response has been sent.
+        # The bytes are handed to the worker in memory — no disk re-read.
+        # Thumbnails stay lazy (see get_thumbnail)
+        async with aiofiles.open(file_path, "wb") as buffer:
+            await buffer.write(data)
+        background_tasks.add_task(
+            optimize_upload_async, data, file_path,
+            max_width=1200, max_height=1200, quality=85)
+    else:
+        await optimize_upload_async(data, file_path, max_width=1200, max_height=1200, quality=85)
+
     return f"/static/uploads/{upload_dir}/{unique_filename}"
 
+# ==================== IMAGE ROUTES ====================
+
+def _file_etag(stat_result) -> str:
+    """Entity tag from file mtime+size (same scheme Starlette uses)"""
+    etag_base = f"{stat_result.st_mtime}-{stat_result.st_size}"
+    return f'"{hashlib.md5(etag_base.encode()).hexdigest()}"'
+
+@app.get("/thumb/{upload_dir}/{filename}")
+async def get_thumbnail(request: Request, upload_dir: str, filename: str):
+    """Serve a thumbnail, generating it on first request"""
+    if upload_dir not in ("posts", "profiles") or Path(filename).name != filename:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    source_path = BASE_DIR / "static" / "uploads" / upload_dir / filename
+    thumb_path = source_path.parent / f"thumb_{filename}"
+
+    if not thumb_path.exists():
+        if not source_path.exists():
+            raise HTTPException(status_code=404, detail="Image not found")
+        created = await create_thumbnail_async(source_path)
+        if created is None:
+            raise HTTPException(status_code=500, detail="Could not create thumbnail")
+
+    cache_headers = {"Cache-Control": "public, max-age=604800"}
+
+    # Conditional GET: answer 304 with no body when the browser's cached
+    # copy is still current
+    etag = _file_etag(thumb_path.stat())
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, **cache_headers})
+
+    return FileResponse(thumb_path, headers=cache_headers)
+
 # ==================== HOME & AUTH ROUTES ====================
 
 @app.get("/", response_class=HTMLResponse)
-async def home(request: Request):
-    username = get_current_user(request)
+async def home(request: Request, username: Optional[str] = Depends(get_current_user)):
     
     # If user is logged in, redirect to feed
     if username:
@@ -116,7 +279,9 @@ async def register(request: Request, username: str = Form(...), email: str = For
     # Create new user
     user_data = {
         "username": username,
+        "username_lower": username.lower(),  # for case-insensitive search
         "email": email,
+        "email_lower": email.lower(),
         "password": hash_password(password),
         "profile_pic": None,  # Default: no profile picture
         "followers": [],
@@ -141,7 +306,8 @@ async def login_page(request: Request, error: str = None, registered: bool = Fal
 async def login(request: Request, username: str = Form(...), password: str = Form(...)):
     db = get_database()
     
-    user = await db.users.find_one({"username": username})
+    # Project just the hash so the covering (username, password) index serves this
+    user = await db.users.find_one({"username": username}, {"password": 1})
     if not user:
         return templates.TemplateResponse("login.html", {
             "request": request,
@@ -149,7 +315,10 @@ async def login(request: Request, username: str = Form(...), password: str = For
             "username": username
         })
     
-    if not verify_password(password, user["password"]):
+    # bcrypt verification is CPU-bound (~100ms by design) — run it in a
+    # worker thread so it doesn't stall every other request on the loop
+    verified = await asyncio.to_thread(verify_password, password, user["password"])
+    if not verified:
         return templates.TemplateResponse("login.html", {
             "request": request,
             "error": "Incorrect password. Please try again.",
@@ -162,73 +331,133 @@ async def login(request: Request, username: str = Form(...), password: str = For
     return response
 
 @app.get("/logout")
-async def logout():
+async def logout(request: Request):
+    token = request.cookies.get("access_token")
+    if token:
+        TOKEN_CACHE.pop(token, None)
     response = RedirectResponse("/", status_code=303)
     response.delete_cookie("access_token")
     return response
 
 # ==================== FEED & POSTS ROUTES ====================
 
+def _post_join_stages(username: str) -> list:
+    """Trailing aggregation stages that compute per-post fields server-side;
+    author avatars come from the in-process PFP cache instead of a $lookup,
+    which keeps hot authors out of the database entirely"""
+    return [
+        {"$addFields": {
+            # Stored counters; $size fallback covers posts created before
+            # the counters existed
+            "like_count": {"$ifNull": ["$like_count", {"$size": "$likes"}]},
+            "comment_count": {"$ifNull": ["$comment_count", {"$size": "$comments"}]},
+            "liked": {"$in": [username, "$likes"]}
+        }},
+        # liked and the counters are computed above, so neither array needs
+        # to leave the server
+        {"$project": {"comments": 0, "likes": 0}}
+    ]
+
 @app.get("/feed", response_class=HTMLResponse)
-async def feed(request: Request, filter: str = None):
-    username = get_current_user(request)
+async def feed(request: Request, filter: str = None, before: str = None,
+               username: Optional[str] = Depends(get_current_user)):
     if not username:
         return RedirectResponse("/login")
     
     db = get_database()
-    
-    # Get user data for following filter
-    user = await db.users.find_one({"username": username})
-    following = user.get("following", [])
-    
-    # Apply filters
+
+    # Cache-aside on the rendered page. Keys are per-viewer (liked flags and
+    # edit buttons are viewer-specific) and include the feed version, which
+    # write paths bump to invalidate every cached copy at once
+    # Keyset pagination: ?before=<ISO timestamp> continues past the last
+    # rendered post without skip/offset scans
+    before_dt = None
+    if before:
+        try:
+            before_dt = datetime.fromisoformat(before)
+        except ValueError:
+            before_dt = None
+
+    feed_ver = await cache_version(FEED_CACHE_VER)
+    cache_key = f"v1:feed:{feed_ver}:{filter or 'all'}:{before or ''}:{username}"
+    cached = await cache_get(cache_key)
+    if cached is not None:
+        return HTMLResponse(cached)
+
+    # Apply filters; each branch is a single aggregation, so the whole feed
+    # is one round-trip
+    needs_feed_backfill = False
     if filter == "following":
-        # Show posts only from users you follow
-        if following:
-            query = {"author": {"$in": following + [username]}}
+        # Prefer the materialized feed (fanout-on-write in Redis): a bounded
+        # id list independent of how many accounts the user follows. Only
+        # trust it when it holds a full page — a set that was created after
+        # deploy holds just the posts fanned out since then, and serving it
+        # early would hide the user's pre-existing history. Short sets are
+        # backfilled from the pull query below so they fill up fast
+        feed_ids = await materialized_feed_ids(username, 100)
+        if feed_ids and len(feed_ids) >= 100:
+            match = {"_id": {"$in": [ObjectId(i) for i in feed_ids]}}
         else:
-            query = {"author": username}
-        posts = await db.posts.find(query).sort("timestamp", -1).limit(100).to_list(100)
-    
+            needs_feed_backfill = True
+            user = await db.users.find_one({"username": username}, {"following": 1})
+            following = (user or {}).get("following", [])
+            if following:
+                match = {"author": {"$in": following + [username]}}
+            else:
+                match = {"author": username}
+        pipeline = [
+            {"$match": match},
+            {"$sort": {"timestamp": -1}},
+            {"$limit": 100}
+        ] + _post_join_stages(username)
+
     elif filter == "popular":
-        # Show most liked posts (sorted by like count)
-        posts = await db.posts.aggregate([
-            {"$addFields": {"like_count": {"$size": "$likes"}}},
+        # Show most liked posts; the stored counter makes this a plain
+        # indexed sort instead of computing $size for every document
+        pipeline = [
             {"$sort": {"like_count": -1, "timestamp": -1}},
             {"$limit": 100}
-        ]).to_list(100)
-    
+        ] + _post_join_stages(username)
+
     elif filter == "recent":
         # Show posts from last 24 hours only
         from datetime import timedelta
         yesterday = datetime.utcnow() - timedelta(days=1)
-        posts = await db.posts.find({"timestamp": {"$gte": yesterday}}).sort("timestamp", -1).limit(100).to_list(100)
-    
+        pipeline = [
+            {"$match": {"timestamp": {"$gte": yesterday}}},
+            {"$sort": {"timestamp": -1}},
+            {"$limit": 100}
+        ] + _post_join_stages(username)
+
     else:
         # Default: All posts (global feed)
-        posts = await db.posts.find({}).sort("timestamp", -1).limit(100).to_list(100)
-    
-    # Format posts and fetch author profile pictures
+        match = {"timestamp": {"$lt": before_dt}} if before_dt else {}
+        pipeline = [
+            {"$match": match},
+            {"$sort": {"timestamp": -1}},
+            {"$limit": 100}
+        ] + _post_join_stages(username)
+
+    posts = await aggregate_to_list(db.posts, pipeline, 100)
+    if needs_feed_backfill:
+        await backfill_feed(username, ((str(p["_id"]), p["timestamp"].timestamp()) for p in posts))
+    pfps = await get_pfps(db, (post["author"] for post in posts))
     for post in posts:
         post["id"] = str(post["_id"])
-        post["liked"] = username in post.get("likes", [])
-        post["like_count"] = len(post.get("likes", []))
-        post["comment_count"] = len(post.get("comments", []))
-        
-        # Fetch author's profile picture
-        author_user = await db.users.find_one({"username": post["author"]}, {"profile_pic": 1})
-        post["author_pfp"] = author_user.get("profile_pic") if author_user else None
-    
-    return templates.TemplateResponse("feed.html", {
-        "request": request, 
+        post["author_pfp"] = pfps.get(post["author"])
+
+    html = templates.get_template("feed.html").render({
+        "request": request,
         "username": username,
         "posts": posts,
         "filter": filter
     })
+    await cache_set(cache_key, html, 10)
+    return HTMLResponse(html)
 
 @app.get("/search", response_class=HTMLResponse)
-async def search(request: Request, q: str = ""):
-    username = get_current_user(request)
+async def search(request: Request, q: str = "",
+                 username: Optional[str] = Depends(get_current_user)):
     if not username:
         return RedirectResponse("/login")
     
@@ -237,13 +466,16 @@ async def search(request: Request, q: str = ""):
     # Search query (case-insensitive)
     query = q.strip()
     
-    # Search users by username or email
+    # Search users by username or email: a prefix match against the stored
+    # lowercased fields keeps the search case-insensitive while letting the
+    # planner bound the scan with the username_lower/email_lower indexes
     users = []
     if query:
+        prefix = {"$regex": f"^{re.escape(query.lower())}"}
         users = await db.users.find({
             "$or": [
-                {"username": {"$regex": query, "$options": "i"}},
-                {"email": {"$regex": query, "$options": "i"}}
+                {"username_lower": prefix},
+                {"email_lower": prefix}
             ]
         }, {"password": 0}).limit(20).to_list(20)
         
@@ -252,23 +484,19 @@ async def search(request: Request, q: str = ""):
             user["followers_count"] = len(user.get("followers", []))
             user["following_count"] = len(user.get("following", []))
     
-    # Search posts by content
+    # Search posts by content via the text index, ranked by relevance
     posts = []
     if query:
-        posts = await db.posts.find({
-            "content": {"$regex": query, "$options": "i"}
-        }).sort("timestamp", -1).limit(20).to_list(20)
-        
-        # Format posts
+        pipeline = [
+            {"$match": {"$text": {"$search": query}}},
+            {"$sort": {"score": {"$meta": "textScore"}, "timestamp": -1}},
+            {"$limit": 20}
+        ] + _post_join_stages(username)
+        posts = await aggregate_to_list(db.posts, pipeline, 20)
+        pfps = await get_pfps(db, (post["author"] for post in posts))
         for post in posts:
             post["id"] = str(post["_id"])
-            post["liked"] = username in post.get("likes", [])
-            post["like_count"] = len(post.get("likes", []))
-            post["comment_count"] = len(post.get("comments", []))
-            
-            # Fetch author profile picture
-            author_user = await db.users.find_one({"username": post["author"]}, {"profile_pic": 1})
-            post["author_pfp"] = author_user.get("profile_pic") if author_user else None
+            post["author_pfp"] = pfps.get(post["author"])
     
     return templates.TemplateResponse("search_results.html", {
         "request": request,
@@ -281,10 +509,11 @@ async def search(request: Request, q: str = ""):
 @app.post("/posts/create")
 async def create_post(
     request: Request, 
+    background_tasks: BackgroundTasks,
     content: str = Form(...), 
-    image: Optional[UploadFile] = File(None)
+    image: Optional[UploadFile] = File(None),
+    username: Optional[str] = Depends(get_current_user)
 ):
-    username = get_current_user(request)
     if not username:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
@@ -293,7 +522,7 @@ async def create_post(
     # Save image if provided
     image_url = None
     if image and image.filename:
-        image_url = await save_upload_file(image, "posts")
+        image_url = await save_upload_file(image, "posts", background_tasks)
     
     post_data = {
         "author": username,
@@ -301,14 +530,25 @@ async def create_post(
         "image": image_url,
         "timestamp": datetime.utcnow(),
         "likes": [],
-        "comments": []
+        "comments": [],
+        "like_count": 0,
+        "comment_count": 0
     }
-    await db.posts.insert_one(post_data)
+    result = await db.posts.insert_one(post_data)
+
+    # Fan the new post out to followers' materialized feeds (plus the
+    # author's own, so it shows in their "following" view)
+    author_doc = await db.users.find_one({"username": username}, {"followers": 1})
+    recipients = (author_doc or {}).get("followers", []) + [username]
+    await fanout_post(recipients, str(result.inserted_id), post_data["timestamp"])
+
+    await bump_version(FEED_CACHE_VER)
+    await bump_version(profile_cache_ver(username))
     return RedirectResponse("/feed", status_code=303)
 
 @app.get("/posts/{post_id}", response_class=HTMLResponse)
-async def view_post(request: Request, post_id: str):
-    username = get_current_user(request)
+async def view_post(request: Request, post_id: str,
+                    username: Optional[str] = Depends(get_current_user)):
     if not username:
         return RedirectResponse("/login")
     
@@ -321,15 +561,16 @@ async def view_post(request: Request, post_id: str):
     post["id"] = str(post["_id"])
     post["liked"] = username in post.get("likes", [])
     post["like_count"] = len(post.get("likes", []))
+    # Computed once here so the template doesn't apply |length per mention
+    post["comment_count"] = len(post.get("comments", []))
     
-    # Fetch author's profile picture
-    author_user = await db.users.find_one({"username": post["author"]}, {"profile_pic": 1})
-    post["author_pfp"] = author_user.get("profile_pic") if author_user else None
-    
-    # Fetch profile pictures for commenters
+    # Fetch author and commenter profile pictures through the L1 cache
+    names = {post["author"]} | {c["username"] for c in post.get("comments", [])}
+    pfps = await get_pfps(db, names)
+
+    post["author_pfp"] = pfps.get(post["author"])
     for comment in post.get("comments", []):
-        commenter = await db.users.find_one({"username": comment["username"]}, {"profile_pic": 1})
-        comment["user_pfp"] = commenter.get("profile_pic") if commenter else None
+        comment["user_pfp"] = pfps.get(comment["username"])
     
     return templates.TemplateResponse("post_detail.html", {
         "request": request,
@@ -338,31 +579,34 @@ async def view_post(request: Request, post_id: str):
     })
 
 @app.post("/posts/{post_id}/like")
-async def like_post(request: Request, post_id: str):
-    username = get_current_user(request)
+async def like_post(request: Request, post_id: str,
+                    username: Optional[str] = Depends(get_current_user)):
     if not username:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
     db = get_database()
-    
-    post = await db.posts.find_one({"_id": ObjectId(post_id)})
-    if not post:
+
+    oid = ObjectId(post_id)
+
+    # One pipeline update toggles membership server-side and recomputes the
+    # stored counter from the result — always a single round-trip, atomic,
+    # and unlike the conditional two-step it never needs a second attempt
+    result = await db.posts.update_one(
+        {"_id": oid},
+        [
+            {"$set": {"likes": {"$cond": [
+                {"$in": [username, "$likes"]},
+                {"$setDifference": ["$likes", [username]]},
+                {"$concatArrays": ["$likes", [username]]}
+            ]}}},
+            {"$set": {"like_count": {"$size": "$likes"}}}
+        ]
+    )
+    if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Post not found")
     
-    likes = post.get("likes", [])
-    if username in likes:
-        # Unlike - Toggle off
-        await db.posts.update_one(
-            {"_id": ObjectId(post_id)},
-            {"$pull": {"likes": username}}
-        )
-    else:
-        # Like - Toggle on
-        await db.posts.update_one(
-            {"_id": ObjectId(post_id)},
-            {"$addToSet": {"likes": username}}
-        )
-    
+    await bump_version(FEED_CACHE_VER)
+
     # Redirect back to referring page (feed or post detail)
     referer = request.headers.get("referer", f"/posts/{post_id}")
     if "/feed" in referer:
@@ -371,8 +615,8 @@ async def like_post(request: Request, post_id: str):
         return RedirectResponse(f"/posts/{post_id}", status_code=303)
 
 @app.post("/posts/{post_id}/comment")
-async def add_comment(request: Request, post_id: str, text: str = Form(...)):
-    username = get_current_user(request)
+async def add_comment(request: Request, post_id: str, text: str = Form(...),
+                      username: Optional[str] = Depends(get_current_user)):
     if not username:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
@@ -386,19 +630,21 @@ async def add_comment(request: Request, post_id: str, text: str = Form(...)):
     
     await db.posts.update_one(
         {"_id": ObjectId(post_id)},
-        {"$push": {"comments": comment}}
+        {"$push": {"comments": comment}, "$inc": {"comment_count": 1}}
     )
-    
+
+    await bump_version(FEED_CACHE_VER)
     return RedirectResponse(f"/posts/{post_id}", status_code=303)
 
 @app.get("/posts/{post_id}/edit", response_class=HTMLResponse)
-async def edit_post_page(request: Request, post_id: str):
-    username = get_current_user(request)
+async def edit_post_page(request: Request, post_id: str,
+                         username: Optional[str] = Depends(get_current_user)):
     if not username:
         return RedirectResponse("/login")
 
     db = get_database()
-    post = await db.posts.find_one({"_id": ObjectId(post_id)})
+    # The edit form only needs the author (for the check) and the content
+    post = await db.posts.find_one({"_id": ObjectId(post_id)}, {"author": 1, "content": 1})
 
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
@@ -410,89 +656,112 @@ async def edit_post_page(request: Request, post_id: str):
     return templates.TemplateResponse("edit_post.html", {"request": request, "post": post, "username": username})
 
 @app.post("/posts/{post_id}/edit")
-async def edit_post(request: Request, post_id: str, content: str = Form(...)):
-    username = get_current_user(request)
+async def edit_post(request: Request, post_id: str, content: str = Form(...),
+                    username: Optional[str] = Depends(get_current_user)):
     if not username:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
     db = get_database()
-    post = await db.posts.find_one({"_id": ObjectId(post_id)})
-
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
 
-    if post["author"] != username:
-        raise HTTPException(status_code=403, detail="You are not authorized to edit this post")
+    oid = ObjectId(post_id)
 
-    await db.posts.update_one(
-        {"_id": ObjectId(post_id)},
+    # Fuse the authorization check into the write: the filter only matches
+    # the author's own post, so the common case is one round-trip
+    result = await db.posts.update_one(
+        {"_id": oid, "author": username},
         {"$set": {"content": content}}
     )
+    if result.matched_count == 0:
+        exists = await db.posts.find_one({"_id": oid}, {"_id": 1})
+        if not exists:
+            raise HTTPException(status_code=404, detail="Post not found")
+        raise HTTPException(status_code=403, detail="You are not authorized to edit this post")
 
+    await bump_version(FEED_CACHE_VER)
     return RedirectResponse(f"/posts/{post_id}", status_code=303)
 
 @app.post("/posts/{post_id}/delete")
-async def delete_post(request: Request, post_id: str):
-    username = get_current_user(request)
+async def delete_post(request: Request, post_id: str,
+                      username: Optional[str] = Depends(get_current_user)):
     if not username:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
     db = get_database()
-    post = await db.posts.find_one({"_id": ObjectId(post_id)})
 
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
+    oid = ObjectId(post_id)
 
-    if post["author"] != username:
+    # Same fused pattern as edit_post: only the author's delete matches
+    result = await db.posts.delete_one({"_id": oid, "author": username})
+    if result.deleted_count == 0:
+        exists = await db.posts.find_one({"_id": oid}, {"_id": 1})
+        if not exists:
+            raise HTTPException(status_code=404, detail="Post not found")
         raise HTTPException(status_code=403, detail="You are not authorized to delete this post")
 
-    await db.posts.delete_one({"_id": ObjectId(post_id)})
-
+    await bump_version(FEED_CACHE_VER)
+    await bump_version(profile_cache_ver(username))
     return RedirectResponse("/feed", status_code=303)
 
 # ==================== PROFILE & FOLLOWER ROUTES ====================
 
 @app.get("/profile/{username}", response_class=HTMLResponse)
-async def profile(request: Request, username: str):
-    current_user = get_current_user(request)
+async def profile(request: Request, username: str,
+                  current_user: Optional[str] = Depends(get_current_user)):
     if not current_user:
         return RedirectResponse("/login")
     
     db = get_database()
-    
-    user = await db.users.find_one({"username": username})
+
+    # Cache-aside on the rendered page, keyed per viewer and invalidated by
+    # bumping the profile owner's version counter
+    profile_ver = await cache_version(profile_cache_ver(username))
+    cache_key = f"v1:profile:{username}:{profile_ver}:{current_user}"
+    cached = await cache_get(cache_key)
+    if cached is not None:
+        return HTMLResponse(cached)
+
+    # The user doc and the posts page are independent — issue them in
+    # parallel so the page pays one round-trip of latency, not two
+    user, posts = await asyncio.gather(
+        db.users.find_one({"username": username}),
+        aggregate_to_list(db.posts, [
+            {"$match": {"author": username}},
+            {"$sort": {"timestamp": -1}},
+            {"$limit": 20},
+            {"$addFields": {
+                "like_count": {"$ifNull": ["$like_count", {"$size": "$likes"}]},
+                "comment_count": {"$ifNull": ["$comment_count", {"$size": "$comments"}]}
+            }},
+            {"$project": {"likes": 0, "comments": 0}}
+        ], 20)
+    )
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    # Get user's posts
-    posts = await db.posts.find({"author": username}).sort("timestamp", -1).limit(20).to_list(20)
+
     for post in posts:
         post["id"] = str(post["_id"])
-        post["like_count"] = len(post.get("likes", []))
-        post["comment_count"] = len(post.get("comments", []))
     
     # Check if current user follows this profile
     is_following = current_user in user.get("followers", [])
     
-    # Fetch followers list with user details
+    # Fetch followers and following details in one fused $in query (both
+    # need the same projection) and partition the results in-process
     followers_usernames = user.get("followers", [])
-    followers_list = []
-    if followers_usernames:
-        followers_list = await db.users.find(
-            {"username": {"$in": followers_usernames}},
-            {"username": 1, "email": 1, "profile_pic": 1}
-        ).to_list(100)
-    
-    # Fetch following list with user details
     following_usernames = user.get("following", [])
-    following_list = []
-    if following_usernames:
-        following_list = await db.users.find(
-            {"username": {"$in": following_usernames}},
+    combined = list(set(followers_usernames) | set(following_usernames))
+
+    by_name = {}
+    if combined:
+        docs = await db.users.find(
+            {"username": {"$in": combined}},
             {"username": 1, "email": 1, "profile_pic": 1}
-        ).to_list(100)
+        ).to_list(len(combined))
+        by_name = {d["username"]: d for d in docs}
+
+    followers_list = [by_name[u] for u in followers_usernames if u in by_name]
+    following_list = [by_name[u] for u in following_usernames if u in by_name]
     
-    return templates.TemplateResponse("profile.html", {
+    html = templates.get_template("profile.html").render({
         "request": request,
         "username": current_user,  # For navbar
         "current_user": current_user,
@@ -506,10 +775,12 @@ async def profile(request: Request, username: str):
         "is_own_profile": current_user == username,
         "posts": posts
     })
+    await cache_set(cache_key, html, 60)
+    return HTMLResponse(html)
 
 @app.post("/follow/{username}")
-async def follow_user(request: Request, username: str):
-    current_user = get_current_user(request)
+async def follow_user(request: Request, username: str,
+                      current_user: Optional[str] = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
@@ -529,12 +800,17 @@ async def follow_user(request: Request, username: str):
         {"username": username},
         {"$addToSet": {"followers": current_user}}
     )
-    
+
+    # The materialized feed predates this follow — drop it so the next
+    # "following" load pulls (and re-backfills) with the new author included
+    await clear_feed(current_user)
+    await bump_version(profile_cache_ver(username))
+    await bump_version(profile_cache_ver(current_user))
     return RedirectResponse(f"/profile/{username}", status_code=303)
 
 @app.post("/unfollow/{username}")
-async def unfollow_user(request: Request, username: str):
-    current_user = get_current_user(request)
+async def unfollow_user(request: Request, username: str,
+                        current_user: Optional[str] = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
@@ -551,36 +827,40 @@ async def unfollow_user(request: Request, username: str):
         {"username": username},
         {"$pull": {"followers": current_user}}
     )
-    
+
+    # Drop the materialized feed so the unfollowed author's fanned-out
+    # posts disappear on the next load instead of aging out slowly
+    await clear_feed(current_user)
+    await bump_version(profile_cache_ver(username))
+    await bump_version(profile_cache_ver(current_user))
     return RedirectResponse(f"/profile/{username}", status_code=303)
 
 @app.post("/profile/upload-picture")
-async def upload_profile_picture(request: Request, profile_pic: UploadFile = File(...)):
-    username = get_current_user(request)
+async def upload_profile_picture(request: Request, background_tasks: BackgroundTasks,
+                                 profile_pic: UploadFile = File(...),
+                                 username: Optional[str] = Depends(get_current_user)):
     if not username:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
     db = get_database()
     
-    # Validate file type
-    allowed_types = ["image/jpeg", "image/png", "image/jpg", "image/gif", "image/webp"]
-    if profile_pic.content_type not in allowed_types:
-        raise HTTPException(status_code=400, detail="Invalid file type. Only images allowed.")
-    
-    # Save profile picture
-    image_url = await save_upload_file(profile_pic, "profiles")
+    # Save profile picture (validation happens in save_upload_file)
+    image_url = await save_upload_file(profile_pic, "profiles", background_tasks)
     
     # Update user's profile picture in database
     await db.users.update_one(
         {"username": username},
         {"$set": {"profile_pic": image_url}}
     )
-    
+
+    PFP_CACHE.pop(username, None)
+    await bump_version(profile_cache_ver(username))
+    await bump_version(FEED_CACHE_VER)  # avatars appear in feed cards
     return RedirectResponse(f"/profile/{username}", status_code=303)
 
 @app.get("/profile/edit", response_class=HTMLResponse)
-async def edit_profile_page(request: Request):
-    username = get_current_user(request)
+async def edit_profile_page(request: Request,
+                            username: Optional[str] = Depends(get_current_user)):
     if not username:
         return RedirectResponse("/login")
     
@@ -601,9 +881,9 @@ async def edit_profile(
     request: Request,
     new_username: str = Form(...),
     email: str = Form(None),
-    password: str = Form(None)
+    password: str = Form(None),
+    current_username: Optional[str] = Depends(get_current_user)
 ):
-    current_username = get_current_user(request)
     if not current_username:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
@@ -623,8 +903,10 @@ async def edit_profile(
     update_data = {}
     if new_username and new_username != current_username:
         update_data["username"] = new_username
+        update_data["username_lower"] = new_username.lower()
     if email:
         update_data["email"] = email
+        update_data["email_lower"] = email.lower()
     if password:
         update_data["password"] = hash_password(password)
     
@@ -635,36 +917,40 @@ async def edit_profile(
             {"$set": update_data}
         )
         
-        # If username changed, update all posts and references
+        # If username changed, update all references. The five update_many
+        # calls are batched into one bulk_write per collection (and the two
+        # bulk_writes run concurrently), so the cascade costs two round-trips
+        # instead of five
         if "username" in update_data:
-            await db.posts.update_many(
-                {"author": current_username},
-                {"$set": {"author": new_username}}
-            )
-            
-            # Update followers/following lists
-            await db.users.update_many(
-                {"followers": current_username},
-                {"$set": {"followers.$": new_username}}
-            )
-            await db.users.update_many(
-                {"following": current_username},
-                {"$set": {"following.$": new_username}}
-            )
-            
-            # Update likes
-            await db.posts.update_many(
-                {"likes": current_username},
-                {"$set": {"likes.$": new_username}}
-            )
-            
-            # Update comments
-            await db.posts.update_many(
-                {"comments.username": current_username},
-                {"$set": {"comments.$[elem].username": new_username}},
-                array_filters=[{"elem.username": current_username}]
+            user_ops = [
+                UpdateMany({"followers": current_username},
+                           {"$set": {"followers.$": new_username}}),
+                UpdateMany({"following": current_username},
+                           {"$set": {"following.$": new_username}})
+            ]
+            post_ops = [
+                UpdateMany({"author": current_username},
+                           {"$set": {"author": new_username}}),
+                UpdateMany({"likes": current_username},
+                           {"$set": {"likes.$": new_username}}),
+                UpdateMany({"comments.username": current_username},
+                           {"$set": {"comments.$[elem].username": new_username}},
+                           array_filters=[{"elem.username": current_username}])
+            ]
+            await asyncio.gather(
+                db.users.bulk_write(user_ops, ordered=False),
+                db.posts.bulk_write(post_ops, ordered=False)
             )
             
+            old_token = request.cookies.get("access_token")
+            if old_token:
+                TOKEN_CACHE.pop(old_token, None)
+            PFP_CACHE.pop(current_username, None)
+            PFP_CACHE.pop(new_username, None)
+            await bump_version(FEED_CACHE_VER)
+            await bump_version(profile_cache_ver(current_username))
+            await bump_version(profile_cache_ver(new_username))
+
             # Create new token with new username
             token = create_access_token({"sub": new_username})
             response = RedirectResponse(f"/profile/{new_username}", status_code=303)
@@ -681,7 +967,10 @@ async def admin_login_page(request: Request):
 
 @app.post("/admin/login")
 async def admin_login(username: str = Form(...), password: str = Form(...)):
-    if username != ADMIN_USERNAME or not verify_password(password, ADMIN_PASSWORD_HASH):
+    # Compare bytes: compare_digest raises TypeError on non-ASCII str input
+    username_ok = hmac.compare_digest(username.encode(), ADMIN_USERNAME.encode())
+    password_ok = await asyncio.to_thread(verify_password, password, ADMIN_PASSWORD_HASH)
+    if not (username_ok and password_ok):
         raise HTTPException(status_code=401, detail="Invalid admin credentials")
     
     token = create_access_token({"sub": username, "role": "admin"})
@@ -695,23 +984,29 @@ async def admin_dashboard(request: Request):
     if not token:
         return RedirectResponse("/admin/login")
     
-    from backend.auth import decode_token
     payload = decode_token(token)
     if not payload or payload.get("role") != "admin":
         return RedirectResponse("/admin/login")
     
     db = get_database()
     
-    # Get statistics
-    total_users = await db.users.count_documents({})
-    total_posts = await db.posts.count_documents({})
+    # Get statistics; estimated_document_count reads collection metadata in
+    # O(1) instead of walking the _id index like count_documents({})
+    total_users = await db.users.estimated_document_count()
+    total_posts = await db.posts.estimated_document_count()
     
     # Get most liked posts
-    most_liked_posts = await db.posts.aggregate([
-        {"$project": {"author": 1, "content": 1, "like_count": {"$size": "$likes"}}},
+    # Resolve the counter before sorting: the startup backfill keeps
+    # like_count populated, but computing the $ifNull first means the
+    # ranking is still right for any document that slipped past it
+    # (e.g. restored from an old backup). Low-traffic admin page, so the
+    # non-indexed sort is acceptable
+    most_liked_posts = await aggregate_to_list(db.posts, [
+        {"$addFields": {"like_count": {"$ifNull": ["$like_count", {"$size": "$likes"}]}}},
         {"$sort": {"like_count": -1}},
-        {"$limit": 5}
-    ]).to_list(5)
+        {"$limit": 5},
+        {"$project": {"author": 1, "content": 1, "like_count": 1}}
+    ], 5)
     
     for post in most_liked_posts:
         post["id"] = str(post["_id"])
@@ -743,11 +1038,38 @@ async def admin_delete_user(request: Request, user_id: str):
         raise HTTPException(status_code=401, detail="Not authenticated")
     
     db = get_database()
-    
-    # Delete user and their posts
-    await db.users.delete_one({"_id": ObjectId(user_id)})
-    await db.posts.delete_many({"author": user_id})
-    
+
+    # Posts are keyed by username, not user id — resolve it first (the old
+    # code deleted posts by the stringified ObjectId and matched nothing)
+    oid = ObjectId(user_id)
+    user = await db.users.find_one({"_id": oid}, {"username": 1})
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    username = user["username"]
+
+    # Delete the user and scrub every reference to them, one concurrent
+    # round-trip per collection touched. The pipeline updates rewrite the
+    # arrays and recompute the stored counters in the same atomic step
+    await asyncio.gather(
+        db.users.delete_one({"_id": oid}),
+        db.posts.delete_many({"author": username}),
+        db.users.update_many({"followers": username}, {"$pull": {"followers": username}}),
+        db.users.update_many({"following": username}, {"$pull": {"following": username}}),
+        db.posts.update_many({"likes": username}, [
+            {"$set": {"likes": {"$setDifference": ["$likes", [username]]}}},
+            {"$set": {"like_count": {"$size": "$likes"}}}
+        ]),
+        db.posts.update_many({"comments.username": username}, [
+            {"$set": {"comments": {"$filter": {
+                "input": "$comments",
+                "cond": {"$ne": ["$$this.username", username]}
+            }}}},
+            {"$set": {"comment_count": {"$size": "$comments"}}}
+        ])
+    )
+
+    PFP_CACHE.pop(username, None)
+    await bump_version(FEED_CACHE_VER)
     return RedirectResponse("/admin/dashboard", status_code=303)
 
 @app.post("/admin/posts/{post_id}/delete")
@@ -758,7 +1080,8 @@ async def admin_delete_post(request: Request, post_id: str):
     
     db = get_database()
     await db.posts.delete_one({"_id": ObjectId(post_id)})
-    
+
+    await bump_version(FEED_CACHE_VER)
     return RedirectResponse("/admin/dashboard", status_code=303)
 
 @app.get("/admin/logout")
@@ -5,7 +5,7 @@ Adds multiple users and posts with photos, likes, comments, followers
 import asyncio
 from datetime import datetime, timedelta
 import random
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import AsyncMongoClient
 import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent / 'backend'))
@@ -15,6 +15,10 @@ from auth import hash_password
 MONGO_URL = "mongodb://localhost:27017"
 DB_NAME = "peopleconnects"
 
+# One seeded generator: deterministic data between runs, and pre-drawing in
+# batches keeps RNG calls out of the per-post construction loop
+rng = random.Random(42)
+
 # Test data
 TEST_USERS = [
     {"username": "alice", "email": "alice@example.com", "password": "password123"},
@@ -49,7 +53,7 @@ TEST_POSTS_CONTENT = [
 
 async def create_test_data():
     """Create test users and posts with relationships"""
-    client = AsyncIOMotorClient(MONGO_URL)
+    client = AsyncMongoClient(MONGO_URL)
     db = client[DB_NAME]
     
     print("🗑️  Clearing existing data...")
@@ -57,56 +61,64 @@ async def create_test_data():
     await db.posts.delete_many({})
     
     print("👥 Creating test users...")
-    user_ids = []
-    
-    for user_data in TEST_USERS:
-        user = {
+    user_ids = [u["username"] for u in TEST_USERS]
+
+    # Compute the follower graph entirely in Python first: each user follows
+    # 2-3 random others, and the reverse edges are derived in one pass, so
+    # the user docs can be inserted complete with no follow-up update phase
+    following = {
+        username: rng.sample([u for u in user_ids if u != username],
+                             rng.randint(2, 3))
+        for username in user_ids
+    }
+    followers = {username: [] for username in user_ids}
+    for username, follows in following.items():
+        for follow_user in follows:
+            followers[follow_user].append(username)
+
+    # Build all user docs up front and insert them in one round-trip
+    user_docs = [
+        {
             "username": user_data["username"],
+            "username_lower": user_data["username"].lower(),
             "email": user_data["email"],
+            "email_lower": user_data["email"].lower(),
             "password": hash_password(user_data["password"]),
             "profile_pic": None,
-            "followers": [],
-            "following": [],
+            "followers": followers[user_data["username"]],
+            "following": following[user_data["username"]],
             "created_at": datetime.utcnow()
         }
-        result = await db.users.insert_one(user)
-        user_ids.append(user_data["username"])
-        print(f"   ✅ Created user: {user_data['username']}")
-    
-    # Create follower relationships
-    print("\n🤝 Creating follower relationships...")
-    for i, username in enumerate(user_ids):
-        # Each user follows 2-3 random other users
-        num_following = random.randint(2, 3)
-        possible_follows = [u for u in user_ids if u != username]
-        to_follow = random.sample(possible_follows, num_following)
-        
-        for follow_user in to_follow:
-            # Add to following list
-            await db.users.update_one(
-                {"username": username},
-                {"$addToSet": {"following": follow_user}}
-            )
-            # Add to followers list
-            await db.users.update_one(
-                {"username": follow_user},
-                {"$addToSet": {"followers": username}}
-            )
-        
-        print(f"   ✅ {username} now follows {len(to_follow)} users")
+        for user_data in TEST_USERS
+    ]
+    await db.users.insert_many(user_docs, ordered=False)
+    print(f"   ✅ Created {len(user_docs)} users")
+
+    print("\n🤝 Follower relationships:")
+    for username in user_ids:
+        print(f"   ✅ {username} now follows {len(following[username])} users")
     
     # Create posts
     print("\n📝 Creating test posts...")
-    post_ids = []
+    post_docs = []
+
+    # Pre-draw all per-post randomness in batches
+    n = len(TEST_POSTS_CONTENT)
+    authors = rng.choices(user_ids, k=n)
+    num_likes_all = [rng.randint(0, 4) for _ in range(n)]
+    num_comments_all = [rng.randint(0, 3) for _ in range(n)]
+
+    # Precompute all timestamps (last 7 days) off a single utcnow() reading
+    # instead of doing datetime arithmetic inside the loop
+    now = datetime.utcnow()
+    timestamps = [
+        now - timedelta(days=rng.randint(0, 7), hours=rng.randint(0, 23))
+        for _ in range(n)
+    ]
     
     for i, content in enumerate(TEST_POSTS_CONTENT):
-        # Random author
-        author = random.choice(user_ids)
-        
-        # Random timestamp (last 7 days)
-        days_ago = random.randint(0, 7)
-        hours_ago = random.randint(0, 23)
-        timestamp = datetime.utcnow() - timedelta(days=days_ago, hours=hours_ago)
+        author = authors[i]
+        timestamp = timestamps[i]
         
         post = {
             "author": author,
@@ -118,14 +130,14 @@ async def create_test_data():
         }
         
         # Add random likes (0-4 users)
-        num_likes = random.randint(0, 4)
+        num_likes = num_likes_all[i]
         possible_likers = [u for u in user_ids if u != author]
         if possible_likers and num_likes > 0:
-            likers = random.sample(possible_likers, min(num_likes, len(possible_likers)))
+            likers = rng.sample(possible_likers, min(num_likes, len(possible_likers)))
             post["likes"] = likers
         
         # Add random comments (0-3 comments)
-        num_comments = random.randint(0, 3)
+        num_comments = num_comments_all[i]
         if num_comments > 0:
             possible_commenters = [u for u in user_ids if u != author]
             if possible_commenters:
@@ -141,18 +153,25 @@ async def create_test_data():
                 ]
                 
                 for _ in range(num_comments):
-                    commenter = random.choice(possible_commenters)
-                    comment_text = random.choice(comment_texts)
+                    commenter = rng.choice(possible_commenters)
+                    comment_text = rng.choice(comment_texts)
                     comment = {
                         "username": commenter,
                         "text": comment_text,
-                        "timestamp": timestamp + timedelta(hours=random.randint(1, 12))
+                        "timestamp": timestamp + timedelta(hours=rng.randint(1, 12))
                     }
                     post["comments"].append(comment)
         
-        result = await db.posts.insert_one(post)
-        post_ids.append(result.inserted_id)
+        # Stored counters the app's queries and indexes rely on
+        post["like_count"] = len(post["likes"])
+        post["comment_count"] = len(post["comments"])
+
+        post_docs.append(post)
         print(f"   ✅ Created post by {author} ({len(post['likes'])} likes, {len(post['comments'])} comments)")
+
+    # One insert_many for all posts instead of a round-trip per post
+    result = await db.posts.insert_many(post_docs, ordered=False)
+    post_ids = result.inserted_ids
     
     # Display summary
     print("\n" + "="*60)
@@ -167,31 +186,40 @@ async def create_test_data():
         print(f"  Password: {user['password']}")
         print()
     
-    # Show some stats
-    total_likes = 0
-    total_comments = 0
-    for post_id in post_ids:
-        post = await db.posts.find_one({"_id": post_id})
-        total_likes += len(post.get("likes", []))
-        total_comments += len(post.get("comments", []))
+    # Show some stats (computed server-side in one aggregation)
+    cursor = await db.posts.aggregate([
+        {"$group": {
+            "_id": None,
+            "likes": {"$sum": {"$size": "$likes"}},
+            "comments": {"$sum": {"$size": "$comments"}}
+        }}
+    ])
+    stats = await cursor.to_list(1)
+    total_likes = stats[0]["likes"] if stats else 0
+    total_comments = stats[0]["comments"] if stats else 0
     
     print(f"Total Likes: {total_likes}")
     print(f"Total Comments: {total_comments}")
     print("="*60)
     
-    # Show follower stats
+    # Show follower stats; one aggregation returns just the counts instead
+    # of a find_one (and a full array transfer) per user
     print("\nFollower Statistics:")
     print("-" * 40)
-    for username in user_ids:
-        user = await db.users.find_one({"username": username})
-        followers_count = len(user.get("followers", []))
-        following_count = len(user.get("following", []))
-        print(f"  {username}: {followers_count} followers, {following_count} following")
+    cursor = await db.users.aggregate([
+        {"$project": {
+            "username": 1,
+            "followers_count": {"$size": "$followers"},
+            "following_count": {"$size": "$following"}
+        }}
+    ])
+    async for user in cursor:
+        print(f"  {user['username']}: {user['followers_count']} followers, {user['following_count']} following")
     
     print("\n🎉 Ready to start the application!")
     print("Run: python -m backend.main")
     
-    client.close()
+    await client.close()
 
 if __name__ == "__main__":
     print("="*60)